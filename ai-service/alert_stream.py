@@ -0,0 +1,410 @@
+"""
+Streaming aggregation of analysis results into real-time alerts.
+
+Every completed analysis is handed to `AlertAggregator.record`, which only does a
+non-blocking put onto a bounded queue. A background thread extracts the entities
+and domains each text mentions, keeps sliding-window counters and a risk-score
+histogram per key (bounded by an LRU over keys), and raises an alert when a key
+crosses the high-risk threshold or its volume spikes against its own baseline.
+
+State is per process. With several uvicorn workers, pass the same `address` to every
+worker's aggregator: the first to bind it hosts the aggregation and the others forward
+their extracted keys to it and ask it for alerts, so thresholds see all traffic and
+every worker serves the same `/alerts`. If the host goes away, another worker takes
+over (with fresh windows).
+"""
+
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from typing import Any, Dict, List, Optional, Tuple
+
+ENTITY_RE = re.compile(r"\b[A-Z][a-zA-Z0-9&]+(?:\s+[A-Z][a-zA-Z0-9&]+)*\s+(?:Inc|Ltd|Corp|Co|LLC|Group|Holdings|Capital|Ventures|Solutions)\b\.?")
+DOMAIN_RE = re.compile(r"https?://(?:www\.)?([a-zA-Z0-9.-]+\.[a-zA-Z]{2,})")
+HIGH_RISK_SCORE = 70
+HISTOGRAM_BINS = 10
+MAX_SCAN_CHARS = 5000
+FORWARD_BATCH = 256
+SHARED_REPLY_TIMEOUT = 2.0
+DEFAULT_AUTHKEY = b"investiguard-alerts"
+# Sentence-initial words that the capitalized-name pattern would otherwise absorb
+LEADING_STOPWORDS = {
+    "a", "about", "and", "at", "buy", "by", "for", "from", "get", "in", "invest", "join",
+    "new", "now", "our", "sell", "the", "this", "trade", "why", "with", "your"
+}
+
+
+def _entity_name(match: str) -> str:
+    words = match.rstrip(".").split()
+    while len(words) > 2 and words[0].lower() in LEADING_STOPWORDS:
+        words.pop(0)
+    return " ".join(words)
+
+
+def extract_keys(text: str, link: Optional[str] = None) -> List[str]:
+    """Entities (company-like names) and domains mentioned by a piece of content"""
+    text = text[:MAX_SCAN_CHARS]
+    keys = {f"entity:{_entity_name(match.group(0))}" for match in ENTITY_RE.finditer(text)}
+    keys.update(f"domain:{domain.lower()}" for domain in DOMAIN_RE.findall(text))
+    if link:
+        match = DOMAIN_RE.search(link)
+        if match:
+            keys.add(f"domain:{match.group(1).lower()}")
+    return sorted(keys)
+
+
+class _WindowStats:
+    """Per-key ring of time buckets with running window totals"""
+
+    __slots__ = ("buckets", "first_bucket", "count", "high_risk", "risk_sum", "histogram", "last_alert")
+
+    def __init__(self, first_bucket: int):
+        self.buckets: deque = deque()  # [bucket_id, count, high_risk, risk_sum, histogram]
+        self.first_bucket = first_bucket  # when tracking of this key began
+        self.count = 0
+        self.high_risk = 0
+        self.risk_sum = 0
+        self.histogram = [0] * HISTOGRAM_BINS
+        self.last_alert: Dict[str, float] = {}
+
+    def add(self, bucket_id: int, risk_score: int, oldest_bucket: int):
+        while self.buckets and self.buckets[0][0] < oldest_bucket:
+            _, count, high_risk, risk_sum, histogram = self.buckets.popleft()
+            self.count -= count
+            self.high_risk -= high_risk
+            self.risk_sum -= risk_sum
+            for index, value in enumerate(histogram):
+                self.histogram[index] -= value
+        if not self.buckets or self.buckets[-1][0] != bucket_id:
+            self.buckets.append([bucket_id, 0, 0, 0, [0] * HISTOGRAM_BINS])
+
+        bucket = self.buckets[-1]
+        is_high_risk = int(risk_score >= HIGH_RISK_SCORE)
+        bin_index = min(HISTOGRAM_BINS - 1, max(0, risk_score) * HISTOGRAM_BINS // 100)
+        bucket[1] += 1
+        bucket[2] += is_high_risk
+        bucket[3] += risk_score
+        bucket[4][bin_index] += 1
+        self.count += 1
+        self.high_risk += is_high_risk
+        self.risk_sum += risk_score
+        self.histogram[bin_index] += 1
+
+
+def _histogram_quantile(histogram: List[int], q: float) -> int:
+    total = sum(histogram)
+    if not total:
+        return 0
+    target = q * total
+    seen = 0
+    for index, count in enumerate(histogram):
+        seen += count
+        if seen >= target:
+            return min(100, (index + 1) * 100 // HISTOGRAM_BINS)
+    return 100
+
+
+class AlertAggregator:
+    """Sliding-window threshold and spike detection over analysis results"""
+
+    def __init__(
+        self,
+        window_seconds: int = 300,
+        bucket_seconds: int = 10,
+        high_risk_threshold: int = 5,
+        spike_factor: float = 3.0,
+        spike_min_count: int = 10,
+        cooldown_seconds: int = 300,
+        max_keys: int = 10000,
+        max_queue_size: int = 10000,
+        max_alerts: int = 50,
+        new_alert_seconds: int = 60,
+        address: Optional[Tuple[str, int]] = None,
+        authkey: bytes = DEFAULT_AUTHKEY,
+    ):
+        self.bucket_seconds = bucket_seconds
+        self.window_buckets = max(2, window_seconds // bucket_seconds)
+        self.high_risk_threshold = high_risk_threshold
+        self.spike_factor = spike_factor
+        self.spike_min_count = spike_min_count
+        self.cooldown_seconds = cooldown_seconds
+        self.max_keys = max_keys
+        self.new_alert_seconds = new_alert_seconds
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max_queue_size)
+        self._stats: "OrderedDict[str, _WindowStats]" = OrderedDict()
+        self._stats_lock = threading.Lock()
+        self._alerts: deque = deque(maxlen=max_alerts)
+        self._alerts_lock = threading.Lock()
+        self._alert_id_counter = 1
+        self._thread: Optional[threading.Thread] = None
+        self.address = address
+        self.authkey = authkey
+        self.role = "local"  # "host" or "client" when sharing one aggregation across workers
+        self._listener: Optional[Listener] = None
+        self._conn = None
+        self._conn_lock = threading.Lock()
+        self.recorded = 0
+        self.dropped = 0
+        self.processed = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        if self.address is not None:
+            self._join_shared()
+        self._thread = threading.Thread(target=self._run, name="alert-aggregator", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=timeout)
+        self._thread = None
+        if self._listener is not None:
+            # Closing the listener here wouldn't interrupt the blocked accept(), and the port
+            # would keep taking connections; wake the accept loop so it closes it instead
+            self._listener = None
+            try:
+                Client(self.address, authkey=self.authkey).close()
+            except (OSError, EOFError, AuthenticationError):
+                pass
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def record(self, text: str, analysis: Dict[str, Any], source: str, link: Optional[str] = None):
+        """Feed one completed analysis; never blocks the request path"""
+        try:
+            # Only the first MAX_SCAN_CHARS are scanned, so queue no more than that; keeps
+            # the queue's memory bounded by count x MAX_SCAN_CHARS whatever the request size
+            self._queue.put_nowait((time.time(), text[:MAX_SCAN_CHARS], link, analysis["risk_score"], source))
+            self.recorded += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def get_alerts(self) -> List[Dict[str, Any]]:
+        if self.role == "client":
+            ok, alerts = self._send(("alerts", None), reply=True)
+            if ok:
+                return alerts
+        now = datetime.now()
+        with self._alerts_lock:
+            alerts = [dict(alert) for alert in self._alerts]
+        for alert in alerts:
+            age = (now - datetime.fromisoformat(alert["timestamp"])).total_seconds()
+            alert["is_new"] = age <= self.new_alert_seconds
+        return alerts
+
+    def status(self) -> Dict[str, Any]:
+        status = self._local_status()
+        if self.role == "client":
+            ok, shared = self._send(("status", None), reply=True)
+            status["shared"] = shared if ok else None
+        return status
+
+    def _local_status(self) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "role": self.role,
+            "running": self._thread is not None,
+            "queue_depth": self._queue.qsize(),
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "processed": self.processed,
+            "tracked_keys": len(self._stats),
+        }
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            if event is None:
+                return
+            if self.role == "client":
+                batch = [event]
+                while len(batch) < FORWARD_BATCH:
+                    try:
+                        event = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if event is None:
+                        self._forward(batch)
+                        return
+                    batch.append(event)
+                self._forward(batch)
+                continue
+            try:
+                self._process(*event)
+            except Exception as e:
+                print(f"⚠️ Alert aggregation failed: {e}")
+            self.processed += 1
+
+    def _process(self, timestamp: float, text: str, link: Optional[str], risk_score: int, source: str):
+        self._process_keys(timestamp, extract_keys(text, link), risk_score, source)
+
+    def _process_keys(self, timestamp: float, keys: List[str], risk_score: int, source: str):
+        bucket_id = int(timestamp // self.bucket_seconds)
+        oldest_bucket = bucket_id - self.window_buckets + 1
+        # The host also applies events forwarded by other workers, from its server threads
+        with self._stats_lock:
+            for key in keys:
+                stats = self._stats.get(key)
+                if stats is None:
+                    stats = self._stats[key] = _WindowStats(bucket_id)
+                    if len(self._stats) > self.max_keys:
+                        self._stats.popitem(last=False)
+                else:
+                    self._stats.move_to_end(key)
+                stats.add(bucket_id, risk_score, oldest_bucket)
+                self._evaluate(key, stats, timestamp, source)
+
+    # Sharing one aggregation across worker processes
+
+    def _join_shared(self):
+        """Host the shared aggregation if its address is free, else connect to the worker hosting it"""
+        try:
+            self._listener = Listener(self.address, authkey=self.authkey)
+        except OSError:
+            try:
+                self._conn = Client(self.address, authkey=self.authkey)
+            except (OSError, EOFError, AuthenticationError) as e:
+                print(f"⚠️ Warning: Could not join shared alert aggregation at {self.address}, "
+                      f"aggregating in this worker only: {e}")
+                self.role = "local"
+                return
+            self.role = "client"
+            return
+        self.role = "host"
+        threading.Thread(target=self._accept, args=(self._listener,), name="alert-aggregator-server", daemon=True).start()
+        print(f"✅ Hosting shared alert aggregation on {self.address[0]}:{self.address[1]} (pid {os.getpid()})")
+
+    def _accept(self, listener: Listener):
+        while True:
+            try:
+                conn = listener.accept()
+            except AuthenticationError:
+                continue
+            except OSError:
+                return
+            if self._listener is not listener:
+                conn.close()
+                listener.close()
+                return
+            threading.Thread(target=self._serve, args=(conn,), name="alert-aggregator-conn", daemon=True).start()
+
+    def _serve(self, conn):
+        with conn:
+            while True:
+                try:
+                    kind, payload = conn.recv()
+                except (EOFError, OSError):
+                    return
+                if kind == "record":
+                    for event in payload:
+                        try:
+                            self._process_keys(*event)
+                        except Exception as e:
+                            print(f"⚠️ Alert aggregation failed: {e}")
+                elif kind == "alerts":
+                    conn.send(self.get_alerts())
+                elif kind == "status":
+                    conn.send(self._local_status())
+
+    def _send(self, message: tuple, reply: bool = False) -> Tuple[bool, Any]:
+        """Send to the hosting worker, rejoining once if it went away; (False, None) if not a client anymore"""
+        with self._conn_lock:
+            for _ in range(2):
+                if self._conn is None:
+                    self._join_shared()
+                    if self.role != "client":
+                        return False, None
+                try:
+                    # The host never sends unprompted, so a readable connection means it closed
+                    # (a send into it could still appear to succeed and lose the message)
+                    if self._conn.poll():
+                        raise EOFError("alert aggregation host closed the connection")
+                    self._conn.send(message)
+                    if not reply:
+                        return True, None
+                    if not self._conn.poll(SHARED_REPLY_TIMEOUT):
+                        raise TimeoutError("no reply from the alert aggregation host")
+                    return True, self._conn.recv()
+                except (OSError, EOFError):
+                    self._conn.close()
+                    self._conn = None
+            return False, None
+
+    def _forward(self, batch: List[tuple]):
+        # Extract keys here so only small key lists cross the connection
+        events = [(timestamp, extract_keys(text, link), risk_score, source)
+                  for timestamp, text, link, risk_score, source in batch]
+        ok, _ = self._send(("record", events))
+        if not ok:
+            # Took over as host (or fell back to local aggregation): apply them here
+            for event in events:
+                self._process_keys(*event)
+        self.processed += len(batch)
+
+    def _evaluate(self, key: str, stats: _WindowStats, timestamp: float, source: str):
+        key_type, name = key.split(":", 1)
+        count, high_risk = stats.count, stats.high_risk
+        bucket_id, current = stats.buckets[-1][0], stats.buckets[-1][1]
+        baseline = (count - current) / (self.window_buckets - 1)
+        # A key seen for less than a full window has no real baseline yet (new keys, and
+        # every key right after startup), so only the threshold rule applies to it
+        has_history = bucket_id - stats.first_bucket >= self.window_buckets
+
+        triggered = []
+        if high_risk >= self.high_risk_threshold:
+            triggered.append("threshold")
+        if has_history and current >= self.spike_min_count and current > self.spike_factor * max(baseline, 1.0):
+            triggered.append("spike")
+        for rule in triggered:
+            if timestamp - stats.last_alert.get(rule, 0) < self.cooldown_seconds:
+                continue
+            stats.last_alert[rule] = timestamp
+            self._raise_alert(rule, key_type, name, stats, current, baseline, timestamp, source)
+
+    def _raise_alert(self, rule: str, key_type: str, name: str, stats: _WindowStats, current: int,
+                     baseline: float, timestamp: float, source: str):
+        count, high_risk = stats.count, stats.high_risk
+        mean_risk = stats.risk_sum / count
+        p90_risk = _histogram_quantile(stats.histogram, 0.9)
+        if rule == "threshold":
+            alert_type = "High Risk"
+            description = f"{high_risk} high-risk analyses mention {name} in the last {self.window_buckets * self.bucket_seconds // 60} minutes"
+        else:
+            alert_type = "Suspicious" if mean_risk >= 40 else "Warning"
+            description = f"Analysis volume for {name} spiked to {current} in {self.bucket_seconds}s (baseline {baseline:.1f})"
+
+        with self._alerts_lock:
+            self._alerts.append({
+                "id": f"alert_{self._alert_id_counter}",
+                "company": name,
+                "alert_type": alert_type,
+                "credibility_score": max(10, 100 - int(mean_risk)),
+                "description": description,
+                "details": {
+                    "source": f"Streaming aggregation ({source})",
+                    "patterns_detected": ["high_risk_volume" if rule == "threshold" else "volume_spike"],
+                    "risk_factors": [
+                        f"{key_type}_mentions:{count}",
+                        f"high_risk_analyses:{high_risk}",
+                        f"mean_risk_score:{mean_risk:.1f}",
+                        f"p90_risk_score:{p90_risk}",
+                    ],
+                    "recommendation": "Investigate further before making investment decisions"
+                },
+                "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+                "is_new": True,
+            })
+            self._alert_id_counter += 1
@@ -0,0 +1,286 @@
+"""
+CPU inference autotuner for the sentiment pipeline.
+
+Sweeps torch intra-op/inter-op threads, micro-batch size, batching window and
+worker process count on this machine against a synthetic corpus, then writes the
+best setting to the inference profile that main.py loads at startup.
+
+    python autotune.py                      # full sweep, writes inference_profile.json
+    python autotune.py --threads 1,2 --batch-sizes 1,8 --duration 5
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing as mp
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+from inference import DEFAULT_PROFILE_PATH, DEFAULT_SENTIMENT_MODEL, apply_torch_settings
+
+SUSPICIOUS_PHRASES = [
+    "guaranteed returns", "get rich quick", "limited time offer", "insider information",
+    "no risk investment", "double your money", "100% guaranteed", "exclusive opportunity",
+    "act now or miss out", "secret strategy", "overnight profit", "risk free trading"
+]
+
+POSITIVE_PHRASES = [
+    "diversified portfolio", "long term investment", "thorough research", "regulated advisor",
+    "transparent fees", "past performance disclaimer", "consult professional", "careful consideration"
+]
+
+FILLER_SENTENCES = [
+    "Our team has been managing client funds for several years.",
+    "Contact us today to learn more about this opportunity.",
+    "Markets move quickly and prices can change without notice.",
+    "Join thousands of investors who already trust our platform.",
+    "Please read the attached terms before you make any decision.",
+    "The fund focuses on technology and renewable energy companies.",
+    "Returns shown are based on historical performance of the strategy.",
+    "Send your deposit by wire transfer to secure your allocation."
+]
+
+
+def build_synthetic_corpus(size: int = 500, seed: int = 42) -> List[str]:
+    """Build investment-pitch style texts of varying length and risk"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        sentences = rng.sample(FILLER_SENTENCES, rng.randint(1, 6))
+        for _ in range(rng.randint(0, 3)):
+            sentences.insert(rng.randrange(len(sentences) + 1), f"This is a {rng.choice(SUSPICIOUS_PHRASES)}.")
+        for _ in range(rng.randint(0, 2)):
+            sentences.insert(rng.randrange(len(sentences) + 1), f"We recommend a {rng.choice(POSITIVE_PHRASES)}.")
+        corpus.append(" ".join(sentences))
+    return corpus
+
+
+def build_grid(threads: List[int], interop: List[int], batch_sizes: List[int], windows_ms: List[float],
+               workers: List[int], cpu_count: int, allow_oversubscribe: bool = False) -> List[Dict[str, Any]]:
+    """Expand the knob values into settings, skipping ones that oversubscribe the cores"""
+    grid = []
+    for worker_count, num_threads, interop_threads, batch_size in itertools.product(workers, threads, interop, batch_sizes):
+        if not allow_oversubscribe and worker_count * num_threads > cpu_count:
+            continue
+        # The window only matters when there is a batch to fill
+        for window in (windows_ms if batch_size > 1 else [0]):
+            grid.append({
+                "num_threads": num_threads,
+                "interop_threads": interop_threads,
+                "batch_size": batch_size,
+                "batch_window_ms": window,
+                "workers": worker_count,
+            })
+    return grid
+
+
+def _benchmark_worker(setting: Dict[str, Any], model: str, corpus: List[str], clients: int,
+                      duration: float, barrier, results, load_timeout: float):
+    """Child process: load the model under the given settings and run closed-loop clients"""
+    try:
+        latencies = _run_clients(setting, model, corpus, clients, duration, barrier, load_timeout)
+        results.put((True, latencies))
+    except Exception as e:
+        # Release the other workers waiting at the barrier
+        barrier.abort()
+        results.put((False, f"{type(e).__name__}: {e}"))
+
+
+def _run_clients(setting: Dict[str, Any], model: str, corpus: List[str], clients: int,
+                 duration: float, barrier, load_timeout: float) -> List[float]:
+    apply_torch_settings(setting)
+    from enhanced_detector import EnhancedFraudDetector
+
+    # Same path as the service: texts are split into segments and scored through the
+    # detector's batcher in profile-sized chunks; cache off so every segment hits the model
+    detector = EnhancedFraudDetector(model_name=model, batch_size=setting["batch_size"],
+                                     batch_window_ms=setting["batch_window_ms"], segment_cache_size=0)
+    if detector.sentiment_analyzer is None:
+        raise RuntimeError(f"could not load sentiment model {model}")
+    for text in corpus[:8]:
+        detector.analyze_text(text)
+
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def client(seed: int, deadline: float):
+        rng = random.Random(seed)
+        local = []
+        while time.perf_counter() < deadline:
+            start_time = time.perf_counter()
+            detector.analyze_text(rng.choice(corpus))
+            local.append((time.perf_counter() - start_time) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    barrier.wait(timeout=load_timeout)
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=client, args=(seed, deadline)) for seed in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    detector.batcher.close()
+    return latencies
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_setting(setting: Dict[str, Any], model: str, corpus: List[str], clients: int, duration: float,
+                load_timeout: float = 300.0) -> Dict[str, Any]:
+    """Benchmark one setting in fresh processes (interop threads can only be set once per process)"""
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(setting["workers"])
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=_benchmark_worker,
+                    args=(setting, model, corpus, clients, duration, barrier, results, load_timeout))
+        for _ in range(setting["workers"])
+    ]
+    for process in processes:
+        process.start()
+
+    # A worker that dies (OOM, crash) never reports, so poll with a deadline and watch exit codes
+    latencies: List[float] = []
+    error = None
+    reported = 0
+    deadline = time.monotonic() + load_timeout + duration + 60
+    while reported < len(processes) and error is None:
+        try:
+            ok, payload = results.get(timeout=1.0)
+            reported += 1
+            if ok:
+                latencies.extend(payload)
+            else:
+                error = payload
+        except queue.Empty:
+            crashed = [process.exitcode for process in processes if process.exitcode not in (None, 0)]
+            if crashed:
+                error = f"worker exited with code {crashed[0]}"
+            elif time.monotonic() > deadline:
+                error = "timed out"
+
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+
+    if error is not None:
+        return {**setting, "status": f"failed: {error}", "requests": 0, "throughput_rps": 0.0,
+                "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    return {
+        **setting,
+        "status": "ok",
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / duration,
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+        "p99_ms": _percentile(latencies, 99),
+    }
+
+
+def select_best(results: List[Dict[str, Any]], max_p95_ms: float) -> Dict[str, Any]:
+    """Highest throughput within the latency budget, else the lowest-latency setting"""
+    succeeded = [result for result in results if result["status"] == "ok"]
+    within_budget = [result for result in succeeded if result["p95_ms"] <= max_p95_ms]
+    if within_budget:
+        return max(within_budget, key=lambda result: result["throughput_rps"])
+    return min(succeeded, key=lambda result: result["p95_ms"])
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def _float_list(value: str) -> List[float]:
+    return [float(item) for item in value.split(",") if item]
+
+
+def _powers_of_two(limit: int) -> List[int]:
+    values = [1]
+    while values[-1] * 2 <= limit:
+        values.append(values[-1] * 2)
+    return values
+
+
+def main():
+    cpu_count = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Autotune CPU inference settings for the sentiment pipeline")
+    parser.add_argument("--model", default=DEFAULT_SENTIMENT_MODEL)
+    parser.add_argument("--threads", type=_int_list, default=_powers_of_two(cpu_count), help="intra-op thread counts")
+    parser.add_argument("--interop", type=_int_list, default=[1, 2], help="inter-op thread counts")
+    parser.add_argument("--batch-sizes", type=_int_list, default=[1, 4, 8, 16])
+    parser.add_argument("--windows-ms", type=_float_list, default=[2, 10])
+    parser.add_argument("--workers", type=_int_list, default=_powers_of_two(max(1, cpu_count // 2)))
+    parser.add_argument("--clients", type=int, default=16, help="concurrent clients per worker")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per setting")
+    parser.add_argument("--load-timeout", type=float, default=300.0, help="seconds allowed for model loading")
+    parser.add_argument("--corpus-size", type=int, default=500)
+    parser.add_argument("--max-p95-ms", type=float, default=250.0, help="latency budget for the chosen setting")
+    parser.add_argument("--allow-oversubscribe", action="store_true")
+    parser.add_argument("--output", default=DEFAULT_PROFILE_PATH)
+    parser.add_argument("--report", default="autotune_report.csv")
+    args = parser.parse_args()
+
+    corpus = build_synthetic_corpus(args.corpus_size)
+    grid = build_grid(args.threads, args.interop, args.batch_sizes, args.windows_ms, args.workers,
+                      cpu_count, args.allow_oversubscribe)
+    if not grid:
+        parser.error("no settings left to try; lower --threads/--workers or pass --allow-oversubscribe")
+
+    print(f"🔧 Autotuning {len(grid)} settings on {cpu_count} cores ({args.duration:.0f}s each)")
+    print(f"{'workers':>7} {'threads':>7} {'interop':>7} {'batch':>5} {'window':>7} "
+          f"{'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    results = []
+    for setting in grid:
+        result = run_setting(setting, args.model, corpus, args.clients, args.duration, args.load_timeout)
+        results.append(result)
+        print(f"{result['workers']:>7} {result['num_threads']:>7} {result['interop_threads']:>7} "
+              f"{result['batch_size']:>5} {result['batch_window_ms']:>7.1f} {result['throughput_rps']:>9.1f} "
+              f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f}"
+              + ("" if result["status"] == "ok" else f"  ❌ {result['status']}"))
+
+    with open(args.report, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+        writer.writeheader()
+        writer.writerows(results)
+
+    if not any(result["status"] == "ok" for result in results):
+        print("❌ Every setting failed; no profile written")
+        raise SystemExit(1)
+    best = select_best(results, args.max_p95_ms)
+    profile = {
+        "num_threads": best["num_threads"],
+        "interop_threads": best["interop_threads"],
+        "batch_size": best["batch_size"],
+        "batch_window_ms": best["batch_window_ms"],
+        "workers": best["workers"],
+        "model": args.model,
+        "cpu_count": cpu_count,
+        "throughput_rps": round(best["throughput_rps"], 1),
+        "p95_ms": round(best["p95_ms"], 1),
+        "tuned_at": datetime.now().isoformat(),
+    }
+    with open(args.output, "w") as f:
+        json.dump(profile, f, indent=2)
+
+    print(f"✅ Best setting: {best['workers']} worker(s) x {best['num_threads']} thread(s), "
+          f"interop {best['interop_threads']}, batch {best['batch_size']} / {best['batch_window_ms']}ms "
+          f"-> {best['throughput_rps']:.1f} req/s, p95 {best['p95_ms']:.1f}ms")
+    print(f"   Profile written to {args.output}, full report in {args.report}")
+
+
+if __name__ == "__main__":
+    main()
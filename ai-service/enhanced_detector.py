@@ -0,0 +1,264 @@
+"""
+Sentiment- and pattern-based fraud detector built on the Hugging Face pipeline.
+
+Kept out of main.py so worker processes (e.g. the shadow evaluator) can build a
+detector without importing the service and loading its models.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from transformers import pipeline
+
+from inference import DEFAULT_SENTIMENT_MODEL, MicroBatcher
+from segment_cache import SegmentCache, split_segments
+
+# Default risk score weighting
+DEFAULT_RISK_WEIGHTS = {
+    "sentiment_weight": 40,   # 0-40 points from negative sentiment
+    "pattern_weight": 15,     # points per suspicious pattern
+    "pattern_cap": 50,        # max points from suspicious patterns
+    "positive_weight": 5,     # reduction per positive pattern
+    "positive_cap": 20,       # max reduction from positive patterns
+}
+
+
+def parse_risk_weights(raw: str) -> Dict[str, float]:
+    """Parse a JSON object of risk weight overrides, rejecting unknown keys"""
+    weights = json.loads(raw)
+    if not isinstance(weights, dict):
+        raise ValueError("expected a JSON object")
+    unknown = sorted(set(weights) - set(DEFAULT_RISK_WEIGHTS))
+    if unknown:
+        raise ValueError(f"unknown weight(s) {', '.join(unknown)}; expected {', '.join(DEFAULT_RISK_WEIGHTS)}")
+    for key, value in weights.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"weight {key} must be a number")
+    return weights
+
+# Enhanced NLP models and analysis functions
+class EnhancedFraudDetector:
+    def __init__(
+        self,
+        model_name: str = DEFAULT_SENTIMENT_MODEL,
+        risk_weights: Optional[Dict[str, float]] = None,
+        batch_size: int = 1,
+        batch_window_ms: float = 0,
+        segment_cache_size: int = 10000
+    ):
+        self.model_name = model_name
+        self.risk_weights = {**DEFAULT_RISK_WEIGHTS, **(risk_weights or {})}
+        self.batch_size = max(1, batch_size)
+        self.batcher = None
+        self.segment_cache = SegmentCache(segment_cache_size)
+        
+        # Initialize sentiment analysis pipeline
+        try:
+            self.sentiment_analyzer = pipeline(
+                "sentiment-analysis",
+                model=model_name,
+                return_all_scores=True
+            )
+            print("✅ Sentiment analysis model loaded successfully")
+        except Exception as e:
+            print(f"⚠️ Warning: Could not load sentiment model: {e}")
+            self.sentiment_analyzer = None
+        
+        # All inference goes through one batcher thread: concurrent requests share a forward
+        # pass, and at most one pass (with the profile's torch threads) runs at a time
+        if self.sentiment_analyzer is not None:
+            self.batcher = MicroBatcher(self._score_sentiment_batch, batch_size, batch_window_ms)
+        
+        # Suspicious financial patterns
+        self.suspicious_patterns = [
+            r"guaranteed\s+(?:returns?|profit|income|money)",
+            r"get\s+rich\s+quick",
+            r"limited\s+time\s+(?:offer|opportunity|deal)",
+            r"insider\s+(?:information|tips?|knowledge)",
+            r"no\s+risk\s+(?:investment|trading|opportunity)",
+            r"double\s+(?:your\s+)?money",
+            r"100%\s+(?:guaranteed|safe|secure)",
+            r"exclusive\s+(?:opportunity|offer|deal)",
+            r"act\s+now\s+or\s+miss\s+out",
+            r"once\s+in\s+a\s+lifetime\s+opportunity",
+            r"secret\s+(?:strategy|method|system)",
+            r"overnight\s+(?:success|profit|wealth)",
+            r"risk\s+free\s+(?:investment|trading)",
+            r"government\s+(?:secret|hidden|classified)",
+            r"millionaire\s+(?:secret|formula|blueprint)"
+        ]
+        
+        # Positive financial patterns (reduce suspicion)
+        self.positive_patterns = [
+            r"diversified\s+(?:portfolio|investment)",
+            r"long\s+term\s+(?:investment|strategy)",
+            r"thorough\s+(?:research|analysis)",
+            r"regulated\s+(?:investment|advisor)",
+            r"transparent\s+(?:fees|costs|risks)",
+            r"past\s+performance\s+disclaimer",
+            r"consult\s+(?:advisor|professional)",
+            r"careful\s+(?:consideration|evaluation)"
+        ]
+    
+    def analyze_text(self, text: str) -> Dict[str, Any]:
+        """Enhanced text analysis using sentiment and pattern detection"""
+        # Score each sentence once; repeated boilerplate is served from the segment cache
+        segments = split_segments(text)
+        segment_results = self.segment_cache.get_or_compute(
+            segments, self._analyze_segments, cacheable=lambda result: not result["fallback"]
+        )
+        
+        # Sentiment analysis (length-weighted mean of segment sentiment)
+        total_chars = sum(len(segment) for segment in segments)
+        if total_chars:
+            sentiment_score = sum(
+                result["sentiment"] * len(segment) for segment, result in zip(segments, segment_results)
+            ) / total_chars
+        else:
+            sentiment_score = 0.5
+        
+        # Pattern detection (distinct patterns matched anywhere in the text)
+        suspicious_count = len(set().union(*(result["suspicious"] for result in segment_results)))
+        positive_count = len(set().union(*(result["positive"] for result in segment_results)))
+        
+        # Calculate risk score
+        risk_score = self._calculate_risk_score(sentiment_score, suspicious_count, positive_count)
+        
+        # Determine fraud alert level
+        fraud_alert = self._determine_fraud_alert(risk_score)
+        
+        # Calculate credibility score
+        credibility_score = max(10, 100 - risk_score)
+        
+        return {
+            "fraud_alert": fraud_alert,
+            "credibility_score": credibility_score,
+            "risk_score": risk_score,
+            "sentiment_score": sentiment_score,
+            "suspicious_patterns_found": suspicious_count,
+            "positive_patterns_found": positive_count,
+            "analysis": self._generate_analysis(fraud_alert, suspicious_count, positive_count, sentiment_score),
+            "confidence": min(95, max(60, 100 - suspicious_count * 5 + positive_count * 2))
+        }
+    
+    def _analyze_segments(self, segments: List[str]) -> List[Dict[str, Any]]:
+        """Compute sentiment and pattern hits for segments missing from the cache"""
+        sentiments = self._analyze_sentiments(segments)
+        results = []
+        for segment, sentiment_score in zip(segments, sentiments):
+            segment_lower = segment.lower()
+            results.append({
+                # Neutral fallback for failed inference; flagged so it is not cached
+                "sentiment": 0.5 if sentiment_score is None else sentiment_score,
+                "fallback": sentiment_score is None,
+                "suspicious": self._match_patterns(segment_lower, self.suspicious_patterns),
+                "positive": self._match_patterns(segment_lower, self.positive_patterns)
+            })
+        return results
+    
+    def _analyze_sentiments(self, texts: List[str]) -> List[Optional[float]]:
+        """Analyze sentiment using Hugging Face model (None where inference failed)"""
+        if self.sentiment_analyzer is None:
+            return [self._heuristic_sentiment(text) for text in texts]
+        
+        try:
+            # Use Hugging Face sentiment analysis
+            futures = [self.batcher.submit(text) for text in texts]
+            all_scores = [future.result() for future in futures]
+        except Exception as e:
+            print(f"⚠️ Sentiment analysis failed: {e}")
+            return [None] * len(texts)
+        
+        return [self._sentiment_from_scores(scores) for scores in all_scores]
+    
+    def _heuristic_sentiment(self, text: str) -> float:
+        """Fallback sentiment when the model is unavailable"""
+        positive_words = ["good", "great", "excellent", "positive", "profitable", "successful"]
+        negative_words = ["bad", "terrible", "negative", "risky", "dangerous", "suspicious"]
+        
+        text_lower = text.lower()
+        positive_count = sum(1 for word in positive_words if word in text_lower)
+        negative_count = sum(1 for word in negative_words if word in text_lower)
+        
+        if positive_count > negative_count:
+            return 0.7
+        elif negative_count > positive_count:
+            return 0.3
+        else:
+            return 0.5
+    
+    def _sentiment_from_scores(self, scores: Any) -> Optional[float]:
+        """Convert pipeline label scores to a 0-1 sentiment score (None if unusable)"""
+        try:
+            if isinstance(scores, Exception):
+                raise scores
+            
+            # Extract negative sentiment score (higher = more negative)
+            negative_score = scores[0]['score'] if scores[0]['label'] == 'NEGATIVE' else scores[1]['score']
+            
+            # Convert to 0-1 scale where 1 = very positive, 0 = very negative
+            sentiment_score = 1 - negative_score
+            
+            return sentiment_score
+            
+        except Exception as e:
+            print(f"⚠️ Sentiment analysis failed: {e}")
+            return None
+    
+    def _score_sentiment_batch(self, texts: List[str]) -> List[Any]:
+        """Run the sentiment pipeline over a micro-batch, isolating per-text failures"""
+        # Bound each forward pass (and its activation memory) by the profile batch size, and
+        # truncate segments past the model's 512 tokens instead of failing the whole chunk
+        results = []
+        for start in range(0, len(texts), self.batch_size):
+            chunk = texts[start:start + self.batch_size]
+            try:
+                results.extend(self.sentiment_analyzer(chunk, batch_size=len(chunk), truncation=True))
+            except Exception:
+                for text in chunk:
+                    try:
+                        results.append(self.sentiment_analyzer(text, truncation=True)[0])
+                    except Exception as e:
+                        results.append(e)
+        return results
+    
+    def _match_patterns(self, text: str, patterns: List[str]) -> frozenset:
+        """Return the patterns found in the text"""
+        return frozenset(pattern for pattern in patterns if re.search(pattern, text, re.IGNORECASE))
+    
+    def _calculate_risk_score(self, sentiment_score: float, suspicious_count: int, positive_count: int) -> int:
+        """Calculate overall risk score"""
+        weights = self.risk_weights
+        
+        # Base risk from sentiment (negative sentiment = higher risk)
+        sentiment_risk = (1 - sentiment_score) * weights["sentiment_weight"]  # 0-40 points
+        
+        # Risk from suspicious patterns
+        pattern_risk = min(weights["pattern_cap"], suspicious_count * weights["pattern_weight"])  # 0-50 points
+        
+        # Reduction from positive patterns
+        positive_reduction = min(weights["positive_cap"], positive_count * weights["positive_weight"])  # 0-20 points reduction
+        
+        # Calculate final risk score
+        risk_score = sentiment_risk + pattern_risk - positive_reduction
+        
+        return max(0, min(100, int(risk_score)))
+    
+    def _determine_fraud_alert(self, risk_score: int) -> str:
+        """Determine fraud alert level based on risk score"""
+        if risk_score >= 70:
+            return "Suspicious"
+        elif risk_score >= 40:
+            return "Warning"
+        else:
+            return "Likely Safe"
+    
+    def _generate_analysis(self, fraud_alert: str, suspicious_count: int, positive_count: int, sentiment_score: float) -> str:
+        """Generate detailed analysis text"""
+        if fraud_alert == "Likely Safe":
+            return f"Content analysis suggests legitimate investment content. Sentiment is {'positive' if sentiment_score > 0.6 else 'neutral'}, with {positive_count} reassuring patterns detected."
+        elif fraud_alert == "Warning":
+            return f"Moderate risk detected. Found {suspicious_count} suspicious patterns. Sentiment analysis shows {'negative' if sentiment_score < 0.4 else 'mixed'} tone. Exercise caution."
+        else:
+            return f"High risk of fraud detected. Multiple suspicious patterns ({suspicious_count}) found. Sentiment analysis indicates negative tone. Avoid this investment."
@@ -0,0 +1,135 @@
+"""
+CPU inference settings for the sentiment pipeline.
+
+Holds the inference profile (torch thread counts, micro-batch size and window,
+worker count) written by `python autotune.py` and loaded by the service at
+startup, plus the micro-batcher used to group concurrent sentiment calls.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_SENTIMENT_MODEL = "distilbert-base-uncased-finetuned-sst-2-english"
+DEFAULT_PROFILE_PATH = "inference_profile.json"
+
+DEFAULT_PROFILE = {
+    "num_threads": None,       # torch intra-op threads (None = torch default)
+    "interop_threads": None,   # torch inter-op threads (None = torch default)
+    "batch_size": 1,           # max texts per sentiment forward pass
+    "batch_window_ms": 0,      # how long to wait for a batch to fill
+    "workers": 1,              # uvicorn worker processes
+}
+
+
+def load_inference_profile(path: str = DEFAULT_PROFILE_PATH) -> Dict[str, Any]:
+    """Load the autotuned profile, falling back to defaults for anything missing"""
+    profile = dict(DEFAULT_PROFILE)
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+            profile.update({key: saved[key] for key in DEFAULT_PROFILE if key in saved})
+            print(f"✅ Inference profile loaded from {path}")
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Warning: Could not read inference profile {path}: {e}")
+
+    # WEB_CONCURRENCY overrides the tuned worker count; launchers and the thread split
+    # below both use this resolved value
+    workers = profile["workers"] = max(1, int(os.getenv("WEB_CONCURRENCY", profile["workers"])))
+
+    # Without a tuned thread count, split the cores between workers instead of
+    # letting every worker claim all of them
+    if profile["num_threads"] is None and workers > 1:
+        profile["num_threads"] = max(1, (os.cpu_count() or 1) // workers)
+    return profile
+
+
+def apply_torch_settings(profile: Dict[str, Any]):
+    """Apply thread settings; must run before the first inference in this process"""
+    import torch
+
+    if profile.get("num_threads"):
+        torch.set_num_threads(int(profile["num_threads"]))
+    if profile.get("interop_threads"):
+        try:
+            torch.set_num_interop_threads(int(profile["interop_threads"]))
+        except RuntimeError as e:
+            # Only allowed once, before any inter-op parallel work has started
+            print(f"⚠️ Warning: Could not set interop threads: {e}")
+
+
+class MicroBatcher:
+    """Group concurrent single-item calls into batched calls on a background thread"""
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], max_batch_size: int, window_ms: float):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = max(0.0, window_ms) / 1000
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.perf_counter() + self.window
+            closing = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    closing = True
+                    break
+                batch.append(entry)
+
+            items = [item for item, _ in batch]
+            try:
+                results = self.batch_fn(items)
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+            if closing:
+                return
+
+
+def main():
+    parser = argparse.ArgumentParser(description="InvestiGuard inference profile tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    workers_parser = subparsers.add_parser("workers", help="Print the resolved worker count (for launch scripts)")
+    workers_parser.add_argument("--profile", default=os.getenv("INFERENCE_PROFILE_PATH", DEFAULT_PROFILE_PATH))
+    args = parser.parse_args()
+
+    if args.command == "workers":
+        # Keep stdout to the number alone; load_inference_profile logs its own messages
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            profile = load_inference_profile(args.profile)
+        print(int(profile["workers"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Sentence-level memoization for detector results.
+
+Texts are split into sentence-sized, whitespace-normalized segments and each
+segment's result is cached under a hash of that exact text in a bounded LRU. Documents that repeat
+boilerplate (disclaimers, templated pitches, signatures) only pay for their new
+segments; hit ratios and the compute time saved are tracked per cache.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+# Sentence punctuation and blank lines; single line breaks stay inside a segment so
+# phrases wrapped across lines still match
+SEGMENT_SPLIT_RE = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+MAX_SEGMENT_CHARS = 1000
+
+
+def split_segments(text: str, max_chars: int = MAX_SEGMENT_CHARS) -> List[str]:
+    """Split text into sentences and paragraphs, chunking any overly long run at word boundaries"""
+    segments = []
+    for piece in SEGMENT_SPLIT_RE.split(text):
+        # Collapse whitespace so the cache key and the detectors see the same text
+        piece = " ".join(piece.split())
+        while len(piece) > max_chars:
+            cut = piece.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            segments.append(piece[:cut])
+            piece = piece[cut:].lstrip()
+        if piece:
+            segments.append(piece)
+    return segments
+
+
+def segment_key(segment: str) -> str:
+    return hashlib.blake2b(segment.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class SegmentCache:
+    """Bounded LRU of per-segment results with hit/compute accounting"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (result, compute_ms)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.chars_hit = 0
+        self.chars_computed = 0
+        self.compute_ms = 0.0
+        self.saved_ms = 0.0
+
+    def get_or_compute(self, segments: List[str], compute_fn: Callable[[List[str]], List[Any]],
+                       cacheable: Optional[Callable[[Any], bool]] = None) -> List[Any]:
+        """Return one result per segment, computing only the segments not already cached
+
+        Computed results for which `cacheable` returns False (e.g. fallbacks after a
+        model failure) are returned but not stored.
+        """
+        keys = [segment_key(segment) for segment in segments]
+        results: Dict[str, Any] = {}
+        missing: Dict[str, str] = {}
+
+        with self._lock:
+            for key, segment in zip(keys, segments):
+                entry = self._entries.get(key)
+                if entry is not None:
+                    if key not in results:
+                        self._entries.move_to_end(key)
+                        results[key] = entry[0]
+                    self.hits += 1
+                    self.chars_hit += len(segment)
+                    self.saved_ms += entry[1]
+                elif key in missing:
+                    # Repeated within this text; computed once below
+                    self.hits += 1
+                    self.chars_hit += len(segment)
+                else:
+                    missing[key] = segment
+                    self.misses += 1
+                    self.chars_computed += len(segment)
+
+        if missing:
+            start_time = time.perf_counter()
+            computed = compute_fn(list(missing.values()))
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+            per_segment_ms = elapsed_ms / len(missing)
+
+            with self._lock:
+                self.compute_ms += elapsed_ms
+                for key, result in zip(missing, computed):
+                    results[key] = result
+                    if cacheable is not None and not cacheable(result):
+                        continue
+                    self._entries[key] = (result, per_segment_ms)
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        return [results[key] for key in keys]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            chars = self.chars_hit + self.chars_computed
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "char_hit_ratio": self.chars_hit / chars if chars else 0.0,
+                "compute_ms": round(self.compute_ms, 2),
+                "saved_ms": round(self.saved_ms, 2),
+            }
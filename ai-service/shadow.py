@@ -0,0 +1,451 @@
+"""
+Shadow evaluation for candidate fraud detectors.
+
+A sampled fraction of live traffic is replayed against a candidate detector in a
+separate low-priority process. The request path only pays for a non-blocking queue
+put; the candidate's verdicts, score deltas and latencies are written to a local
+SQLite store that `python shadow.py report` summarizes, and
+`python shadow.py latency-check` measures primary p99 with shadowing off and on.
+"""
+
+import argparse
+import functools
+import hashlib
+import multiprocessing as mp
+import os
+import queue
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from inference import apply_torch_settings
+
+DEFAULT_DB_PATH = "shadow_results.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shadow_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    text_length INTEGER NOT NULL,
+    primary_alert TEXT NOT NULL,
+    candidate_alert TEXT,
+    primary_score INTEGER NOT NULL,
+    candidate_score INTEGER,
+    primary_latency_ms REAL NOT NULL,
+    candidate_latency_ms REAL,
+    error TEXT
+)
+"""
+
+
+# State of the candidate process (see _init_candidate)
+_candidate = None
+
+
+def _init_candidate(candidate_factory: Callable[[], Any], num_threads: int):
+    """Load the candidate in its own process with a capped, low-priority torch thread pool"""
+    global _candidate
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass
+    apply_torch_settings({"num_threads": num_threads, "interop_threads": 1})
+    _candidate = candidate_factory()
+
+
+def _candidate_ready() -> bool:
+    # EnhancedFraudDetector falls back to a keyword heuristic when its model fails to load;
+    # comparing the primary against that would be meaningless, so treat it as a failed load
+    return _candidate is not None and getattr(_candidate, "sentiment_analyzer", None) is not None
+
+
+def _evaluate_batch(texts: List[str]) -> List[tuple]:
+    """Score texts with the candidate: (fraud_alert, risk_score, latency_ms, error) per text"""
+    results = []
+    for text in texts:
+        start_time = time.perf_counter()
+        try:
+            result = _candidate.analyze_text(text)
+            results.append((result["fraud_alert"], result["risk_score"], (time.perf_counter() - start_time) * 1000, None))
+        except Exception as e:
+            results.append((None, None, None, str(e)))
+    return results
+
+
+class ShadowEvaluator:
+    """Mirror sampled requests to a candidate detector without blocking the caller
+
+    The candidate runs in a separate spawned process (niced, with `num_threads`
+    torch threads), so it shares neither the GIL nor torch's thread pool with the
+    primary. The factory must be picklable, e.g. a functools.partial of a class.
+    """
+
+    def __init__(
+        self,
+        candidate_factory: Callable[[], Any],
+        sample_rate: float = 0.0,
+        max_queue_size: int = 256,
+        max_queue_bytes: int = 16 * 1024 * 1024,
+        db_path: str = DEFAULT_DB_PATH,
+        batch_size: int = 32,
+        num_threads: int = 1,
+    ):
+        self.candidate_factory = candidate_factory
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        # Bounded by count and by queued text bytes so a slow candidate can never grow memory without limit
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue_size)
+        self.max_queue_bytes = max_queue_bytes
+        self._queued_bytes = 0
+        self._bytes_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self.load_failed = False
+        self.submitted = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 and not self.load_failed
+
+    def start(self):
+        """Start the background worker (no-op when shadowing is disabled)"""
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="shadow-evaluator", daemon=True)
+        self._thread.start()
+        print(f"🌓 Shadow evaluation enabled ({self.sample_rate:.1%} of traffic -> {self.db_path})")
+
+    def stop(self, timeout: float = 5.0):
+        """Ask the worker to flush and exit"""
+        thread = self._thread
+        if thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        thread.join(timeout=timeout)
+        self._thread = None
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until the candidate is loaded; False if it failed or timed out"""
+        self._ready.wait(timeout)
+        return self._ready.is_set() and not self.load_failed
+
+    def submit(self, endpoint: str, text: str, primary_result: Dict[str, Any], primary_latency_ms: float):
+        """Maybe enqueue a request for shadow evaluation; never blocks"""
+        if self._thread is None or random.random() >= self.sample_rate:
+            return
+        size = len(text.encode("utf-8"))
+        with self._bytes_lock:
+            if self._queued_bytes + size > self.max_queue_bytes:
+                self.dropped += 1
+                return
+            self._queued_bytes += size
+        item = {
+            "timestamp": datetime.now().isoformat(),
+            "endpoint": endpoint,
+            "text": text,
+            "primary_alert": primary_result["fraud_alert"],
+            "primary_score": primary_result["risk_score"],
+            "primary_latency_ms": primary_latency_ms,
+            "size": size,
+        }
+        try:
+            self._queue.put_nowait(item)
+            self.submitted += 1
+        except queue.Full:
+            self._release(item)
+            self.dropped += 1
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "running": self._thread is not None,
+            "candidate_loaded": self._ready.is_set() and not self.load_failed,
+            "load_failed": self.load_failed,
+            "sample_rate": self.sample_rate,
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "queue_bytes": self._queued_bytes,
+            "queue_bytes_capacity": self.max_queue_bytes,
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "completed": self.completed,
+            "failed": self.failed,
+            "db_path": self.db_path,
+        }
+
+    def _run(self):
+        # Candidate is loaded in the child so a second model never delays startup
+        executor = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_candidate,
+            initargs=(self.candidate_factory, self.num_threads),
+        )
+        try:
+            loaded = executor.submit(_candidate_ready).result()
+        except Exception as e:
+            print(f"⚠️ Warning: Could not load shadow candidate, shadowing disabled: {e}")
+            self._disable(executor)
+            return
+        if not loaded:
+            print("⚠️ Warning: Shadow candidate has no sentiment model, shadowing disabled")
+            self._disable(executor)
+            return
+        self._ready.set()
+
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(SCHEMA)
+        conn.commit()
+
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if item is None:
+                break
+
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                scored = executor.submit(_evaluate_batch, [entry["text"] for entry in batch]).result()
+            except Exception as e:
+                print(f"⚠️ Shadow candidate process failed, shadowing disabled: {e}")
+                self.failed += len(batch)
+                self._write(conn, [self._row(entry, (None, None, None, str(e))) for entry in batch])
+                conn.close()
+                self._disable(executor)
+                return
+            finally:
+                # Texts count against the byte budget until their batch has been scored
+                for entry in batch:
+                    self._release(entry)
+
+            for _, _, _, error in scored:
+                if error is None:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+            self._write(conn, [self._row(entry, result) for entry, result in zip(batch, scored)])
+
+        conn.close()
+        executor.shutdown(wait=False)
+
+    def _disable(self, executor: ProcessPoolExecutor):
+        # Stop accepting samples first so nothing is queued without a reader
+        self.load_failed = True
+        self._thread = None
+        self._ready.set()
+        executor.shutdown(wait=False)
+        self._drain()
+
+    def _release(self, item: Dict[str, Any]):
+        with self._bytes_lock:
+            self._queued_bytes -= item["size"]
+
+    def _row(self, item: Dict[str, Any], result: tuple) -> tuple:
+        candidate_alert, candidate_score, candidate_latency_ms, error = result
+        text = item["text"]
+        return (
+            item["timestamp"],
+            item["endpoint"],
+            hashlib.sha256(text.encode("utf-8")).hexdigest()[:16],
+            len(text),
+            item["primary_alert"],
+            candidate_alert,
+            item["primary_score"],
+            candidate_score,
+            item["primary_latency_ms"],
+            candidate_latency_ms,
+            error,
+        )
+
+    def _write(self, conn: sqlite3.Connection, rows: List[tuple]):
+        try:
+            conn.executemany(
+                "INSERT INTO shadow_results (timestamp, endpoint, text_hash, text_length, primary_alert, "
+                "candidate_alert, primary_score, candidate_score, primary_latency_ms, candidate_latency_ms, error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️ Shadow results write failed: {e}")
+
+    def _drain(self):
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                self._release(item)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def build_report(db_path: str = DEFAULT_DB_PATH, endpoint: Optional[str] = None) -> Dict[str, Any]:
+    """Summarize recorded shadow results"""
+    conn = sqlite3.connect(db_path)
+    conn.execute(SCHEMA)
+    query = ("SELECT endpoint, primary_alert, candidate_alert, primary_score, candidate_score, "
+             "primary_latency_ms, candidate_latency_ms, error FROM shadow_results")
+    params: tuple = ()
+    if endpoint:
+        query += " WHERE endpoint = ?"
+        params = (endpoint,)
+    rows = conn.execute(query, params).fetchall()
+    conn.close()
+
+    evaluated = [row for row in rows if row[7] is None]
+    disagreements: Dict[str, int] = {}
+    score_deltas = []
+    for _, primary_alert, candidate_alert, primary_score, candidate_score, _, _, _ in evaluated:
+        if primary_alert != candidate_alert:
+            key = f"{primary_alert} -> {candidate_alert}"
+            disagreements[key] = disagreements.get(key, 0) + 1
+        score_deltas.append(candidate_score - primary_score)
+
+    primary_latencies = [row[5] for row in rows]
+    candidate_latencies = [row[6] for row in evaluated]
+    abs_deltas = [abs(delta) for delta in score_deltas]
+
+    return {
+        "samples": len(rows),
+        "evaluated": len(evaluated),
+        "errors": len(rows) - len(evaluated),
+        "disagreement_rate": sum(disagreements.values()) / len(evaluated) if evaluated else 0.0,
+        "disagreements": dict(sorted(disagreements.items(), key=lambda kv: -kv[1])),
+        "score_delta": {
+            "mean": sum(score_deltas) / len(score_deltas) if score_deltas else 0.0,
+            "mean_abs": sum(abs_deltas) / len(abs_deltas) if abs_deltas else 0.0,
+            "p95_abs": _percentile(abs_deltas, 95),
+            "max_abs": max(abs_deltas) if abs_deltas else 0,
+        },
+        "latency_ms": {
+            name: {pct: _percentile(values, int(pct[1:])) for pct in ("p50", "p95", "p99")}
+            for name, values in (("primary", primary_latencies), ("candidate", candidate_latencies))
+        },
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print("🌓 Shadow Evaluation Report")
+    print("=" * 60)
+    print(f"Samples: {report['samples']}  Evaluated: {report['evaluated']}  Errors: {report['errors']}")
+    print(f"Verdict disagreement rate: {report['disagreement_rate']:.2%}")
+    for transition, count in report["disagreements"].items():
+        print(f"   {transition}: {count}")
+    delta = report["score_delta"]
+    print(f"Risk score delta (candidate - primary): mean {delta['mean']:+.2f}, "
+          f"mean |Δ| {delta['mean_abs']:.2f}, p95 |Δ| {delta['p95_abs']}, max |Δ| {delta['max_abs']}")
+    print("Latency (ms):")
+    for name, stats in report["latency_ms"].items():
+        print(f"   {name:<10} p50 {stats['p50']:8.2f}  p95 {stats['p95']:8.2f}  p99 {stats['p99']:8.2f}")
+
+
+def _measure_primary(primary: Any, corpus: List[str], shadow: Optional[ShadowEvaluator] = None) -> List[float]:
+    latencies = []
+    for text in corpus:
+        start_time = time.perf_counter()
+        result = primary.analyze_text(text)
+        latency_ms = (time.perf_counter() - start_time) * 1000
+        latencies.append(latency_ms)
+        if shadow is not None:
+            shadow.submit("latency-check", text, result, latency_ms)
+    return latencies
+
+
+def run_latency_check(requests: int, sample_rate: float, num_threads: int, tolerance_pct: float) -> bool:
+    """Compare primary p99 without and with shadowing; True if within tolerance"""
+    from autotune import build_synthetic_corpus
+    from enhanced_detector import EnhancedFraudDetector
+    from inference import load_inference_profile
+
+    # Same torch settings as the service; cache off so every request runs the model
+    apply_torch_settings(load_inference_profile(os.getenv("INFERENCE_PROFILE_PATH", "inference_profile.json")))
+    primary = EnhancedFraudDetector(segment_cache_size=0)
+    corpus = build_synthetic_corpus(requests, seed=7)
+    _measure_primary(primary, corpus[:20])
+
+    baseline = _measure_primary(primary, corpus)
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="shadow-check-"), "shadow_results.db")
+    shadow = ShadowEvaluator(
+        functools.partial(EnhancedFraudDetector, segment_cache_size=0),
+        sample_rate=sample_rate,
+        db_path=db_path,
+        num_threads=num_threads,
+    )
+    shadow.start()
+    if not shadow.wait_ready(timeout=300):
+        print("❌ Shadow candidate did not load")
+        return False
+    shadowed = _measure_primary(primary, corpus, shadow)
+    shadow.stop()
+
+    before, after = _percentile(baseline, 99), _percentile(shadowed, 99)
+    change_pct = (after - before) / before * 100 if before else 0.0
+    print("🌓 Primary latency with shadowing off vs on")
+    print("=" * 60)
+    for name, values in (("off", baseline), ("on", shadowed)):
+        print(f"   shadow {name:<4} p50 {_percentile(values, 50):8.2f}  p95 {_percentile(values, 95):8.2f}  "
+              f"p99 {_percentile(values, 99):8.2f}")
+    print(f"p99 change: {change_pct:+.1f}% (tolerance {tolerance_pct:.1f}%), "
+          f"{shadow.completed} candidate evaluations, {shadow.dropped} dropped")
+    return change_pct <= tolerance_pct
+
+
+def main():
+    parser = argparse.ArgumentParser(description="InvestiGuard shadow evaluation tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    report_parser = subparsers.add_parser("report", help="Summarize recorded shadow results")
+    report_parser.add_argument("--db", default=os.getenv("SHADOW_DB_PATH", DEFAULT_DB_PATH))
+    report_parser.add_argument("--endpoint", help="Only include results from this endpoint")
+    check_parser = subparsers.add_parser("latency-check", help="Measure primary p99 with shadowing off and on")
+    check_parser.add_argument("--requests", type=int, default=500)
+    check_parser.add_argument("--sample-rate", type=float, default=1.0)
+    check_parser.add_argument("--threads", type=int, default=int(os.getenv("SHADOW_TORCH_THREADS", "1")))
+    check_parser.add_argument("--tolerance-pct", type=float, default=5.0)
+    args = parser.parse_args()
+
+    if args.command == "report":
+        print_report(build_report(args.db, args.endpoint))
+    elif args.command == "latency-check":
+        if not run_latency_check(args.requests, args.sample_rate, args.threads, args.tolerance_pct):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Tests for sliding-window threshold and spike alerts, driven with fixed timestamps"""
+
+from alert_stream import AlertAggregator, extract_keys
+
+T0 = 1_700_000_000.0  # aligned to the 10s buckets
+TEXT = "Beware of offers from Acme Capital this week"
+
+
+def make_aggregator(**overrides):
+    options = dict(window_seconds=60, bucket_seconds=10, high_risk_threshold=3, spike_factor=3.0,
+                   spike_min_count=5, cooldown_seconds=300)
+    options.update(overrides)
+    return AlertAggregator(**options)
+
+
+def feed(aggregator, timestamp, count, risk_score=10, text=TEXT):
+    for _ in range(count):
+        aggregator._process(timestamp, text, None, risk_score, "test")
+
+
+def rules(aggregator):
+    return [alert["details"]["patterns_detected"][0] for alert in aggregator.get_alerts()]
+
+
+def test_extract_keys_finds_entity_and_domain():
+    assert extract_keys(TEXT, "https://www.acme-capital.com/offer") == ["domain:acme-capital.com", "entity:Acme Capital"]
+
+
+def test_threshold_alert_when_high_risk_count_is_reached():
+    aggregator = make_aggregator()
+    feed(aggregator, T0, 2, risk_score=90)
+    assert aggregator.get_alerts() == []
+    feed(aggregator, T0 + 5, 1, risk_score=90)
+    alerts = aggregator.get_alerts()
+    assert rules(aggregator) == ["high_risk_volume"]
+    assert alerts[0]["company"] == "Acme Capital"
+    assert alerts[0]["alert_type"] == "High Risk"
+
+
+def test_high_risk_outside_window_does_not_count():
+    aggregator = make_aggregator()
+    feed(aggregator, T0, 2, risk_score=90)
+    feed(aggregator, T0 + 60, 1, risk_score=90)  # first bucket has left the 60s window
+    assert aggregator.get_alerts() == []
+
+
+def test_no_spike_for_a_new_key():
+    aggregator = make_aggregator()
+    feed(aggregator, T0, 50)
+    assert aggregator.get_alerts() == []
+
+
+def test_no_spike_before_a_full_window_of_history():
+    aggregator = make_aggregator()
+    feed(aggregator, T0, 1)
+    feed(aggregator, T0 + 50, 20)  # only 5 buckets after the key was first seen
+    assert aggregator.get_alerts() == []
+
+
+def test_spike_after_a_full_window_of_history():
+    aggregator = make_aggregator()
+    for bucket in range(6):
+        feed(aggregator, T0 + bucket * 10, 1)
+    feed(aggregator, T0 + 60, 5)
+    assert rules(aggregator) == ["volume_spike"]
+    assert "spiked to 5" in aggregator.get_alerts()[0]["description"]
+
+
+def test_steady_volume_is_not_a_spike():
+    aggregator = make_aggregator()
+    for bucket in range(12):
+        feed(aggregator, T0 + bucket * 10, 6)
+    assert aggregator.get_alerts() == []
+
+
+def test_cooldown_suppresses_repeat_alerts_per_rule():
+    aggregator = make_aggregator(cooldown_seconds=100)
+    feed(aggregator, T0, 3, risk_score=90)
+    feed(aggregator, T0 + 20, 3, risk_score=90)
+    assert rules(aggregator) == ["high_risk_volume"]
+    feed(aggregator, T0 + 100, 3, risk_score=90)
+    assert rules(aggregator) == ["high_risk_volume", "high_risk_volume"]
+
+
+def test_least_recently_seen_keys_are_evicted():
+    aggregator = make_aggregator(max_keys=2)
+    feed(aggregator, T0, 1, text="Alpha Capital")
+    feed(aggregator, T0, 1, text="Beta Capital")
+    feed(aggregator, T0, 1, text="Alpha Capital")  # Beta is now least recently seen
+    feed(aggregator, T0, 1, text="Gamma Capital")
+    assert list(aggregator._stats) == ["entity:Alpha Capital", "entity:Gamma Capital"]
+    assert aggregator.status()["tracked_keys"] == 2
+
+
+def test_record_queues_only_the_scanned_prefix():
+    aggregator = make_aggregator()
+    aggregator.record("x" * 100_000, {"risk_score": 10}, "test")
+    _, text, _, _, _ = aggregator._queue.get_nowait()
+    assert len(text) == 5000
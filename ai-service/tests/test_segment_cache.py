@@ -0,0 +1,87 @@
+"""Tests for sentence splitting and the segment LRU"""
+
+from segment_cache import SegmentCache, split_segments
+
+
+def test_split_keeps_phrase_wrapped_across_single_line_break():
+    assert split_segments("Act today to get rich\nquick with us") == ["Act today to get rich quick with us"]
+
+
+def test_split_on_sentence_punctuation_and_blank_lines():
+    text = "First sentence. Second one!  Third?\n\nNew paragraph\n  \n\nLast"
+    assert split_segments(text) == ["First sentence.", "Second one!", "Third?", "New paragraph", "Last"]
+
+
+def test_split_collapses_whitespace():
+    assert split_segments("  guaranteed \t  returns   here ") == ["guaranteed returns here"]
+
+
+def test_split_cuts_long_runs_at_word_boundaries():
+    segments = split_segments("word " * 30, max_chars=22)
+    assert all(len(segment) <= 22 for segment in segments)
+    assert " ".join(segments) == ("word " * 30).strip()
+    assert all(segment.split() == ["word"] * len(segment.split()) for segment in segments)
+
+
+def test_split_cuts_unbroken_runs_at_max_chars():
+    assert split_segments("x" * 25, max_chars=10) == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_split_empty_text():
+    assert split_segments("") == []
+    assert split_segments(" \n\n ") == []
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, segments):
+        self.calls.append(list(segments))
+        return [segment.upper() for segment in segments]
+
+
+def test_duplicates_within_one_text_are_computed_once():
+    cache = SegmentCache(10)
+    compute = Recorder()
+    assert cache.get_or_compute(["a", "b", "a"], compute) == ["A", "B", "A"]
+    assert compute.calls == [["a", "b"]]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_cached_segments_are_not_recomputed():
+    cache = SegmentCache(10)
+    compute = Recorder()
+    cache.get_or_compute(["a", "b"], compute)
+    assert cache.get_or_compute(["b", "c"], compute) == ["B", "C"]
+    assert compute.calls == [["a", "b"], ["c"]]
+
+
+def test_uncacheable_results_are_returned_but_not_stored():
+    cache = SegmentCache(10)
+    compute = Recorder()
+    cacheable = lambda result: result != "BAD"
+    assert cache.get_or_compute(["bad", "ok"], compute, cacheable=cacheable) == ["BAD", "OK"]
+    assert cache.stats()["entries"] == 1
+    cache.get_or_compute(["bad", "ok"], compute, cacheable=cacheable)
+    assert compute.calls == [["bad", "ok"], ["bad"]]
+
+
+def test_evicts_least_recently_used_at_max_entries():
+    cache = SegmentCache(2)
+    compute = Recorder()
+    cache.get_or_compute(["a", "b"], compute)
+    cache.get_or_compute(["a"], compute)  # a is now most recently used
+    cache.get_or_compute(["c"], compute)  # evicts b
+    assert cache.stats()["entries"] == 2
+    cache.get_or_compute(["a", "b"], compute)
+    assert compute.calls[-1] == ["b"]
+
+
+def test_keys_are_exact_text():
+    cache = SegmentCache(10)
+    compute = Recorder()
+    cache.get_or_compute(["Guaranteed returns"], compute)
+    cache.get_or_compute(["guaranteed returns"], compute)
+    assert compute.calls == [["Guaranteed returns"], ["guaranteed returns"]]
@@ -35,5 +35,13 @@ echo ""
 echo "Press Ctrl+C to stop the service"
 echo ""
 
-# Start the service
-uvicorn main:app --reload --host 0.0.0.0 --port 8001
+# Worker count comes from WEB_CONCURRENCY, else the autotuned inference profile
+WORKERS=${WEB_CONCURRENCY:-$(python inference.py workers)}
+
+# Start the service (--reload only works with a single worker)
+if [ "$WORKERS" -gt 1 ]; then
+    echo "⚙️  Running $WORKERS workers from the inference profile (auto-reload disabled)"
+    uvicorn main:app --host 0.0.0.0 --port 8001 --workers "$WORKERS"
+else
+    uvicorn main:app --reload --host 0.0.0.0 --port 8001
+fi